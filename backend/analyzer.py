@@ -1,84 +1,85 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+import pyarrow.dataset as ds
+from pyarrow import fs
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime, date
 
+from parser import ANALYSIS_COLUMNS
+
+ArrayLike = Union[pd.Series, np.ndarray]
+
 class DataAnalyzer:
     """Analyze parsed Excel data and generate insights"""
     
     def __init__(self, data: pd.DataFrame):
         self.data = data
-    
-    def analyze(self, date_from: str, date_to: str, group_by: Optional[str] = None) -> Dict[str, Any]:
-        """Analyze data within date range with optional grouping"""
         
-        # Convert date strings to datetime
-        start_date = pd.to_datetime(date_from)
-        end_date = pd.to_datetime(date_to)
-        
-        # Filter data by date range
-        so_mask = (
-            self.data['so_date_parsed'].notna() & 
-            (self.data['so_date_parsed'] >= start_date) & 
-            (self.data['so_date_parsed'] <= end_date)
+        # Cache date-sorted NumPy arrays per side for range slicing in analyze
+        self._so_dates, self._so_cbm, self._so_qty = self._sorted_arrays(
+            data['so_date_parsed'], data['so_cbm_value'], data['so_qty_value']
         )
-        
-        si_mask = (
-            self.data['si_date_parsed'].notna() & 
-            (self.data['si_date_parsed'] >= start_date) & 
-            (self.data['si_date_parsed'] <= end_date)
+        self._si_dates, self._si_cbm, self._si_qty = self._sorted_arrays(
+            data['si_date_parsed'], data['si_cbm_value'], data['si_qty_value']
         )
+    
+    @classmethod
+    def from_arrow(cls, path: str, date_from: str, date_to: str, group_by: Optional[str] = None) -> 'DataAnalyzer':
+        """Load only the rows and columns needed for a date range from a memory-mapped Arrow IPC file"""
         
-        # Aggregate inbound (SO) data by date
-        so_data = self.data[so_mask].copy()
-        so_daily_cbm = so_data.groupby(so_data['so_date_parsed'].dt.date)['so_cbm_value'].sum().reset_index()
-        so_daily_qty = so_data.groupby(so_data['so_date_parsed'].dt.date)['so_qty_value'].sum().reset_index()
-        
-        so_daily = so_daily_cbm.merge(so_daily_qty, on='so_date_parsed', how='outer')
-        so_daily.columns = ['date', 'inbound_cbm', 'inbound_qty']
-        so_daily['date'] = so_daily['date'].astype(str)
-        
-        # Aggregate outbound (SI) data by date
-        si_data = self.data[si_mask].copy()
-        si_daily_cbm = si_data.groupby(si_data['si_date_parsed'].dt.date)['si_cbm_value'].sum().reset_index()
-        si_daily_qty = si_data.groupby(si_data['si_date_parsed'].dt.date)['si_qty_value'].sum().reset_index()
+        dataset = ds.dataset(path, format='ipc', filesystem=fs.LocalFileSystem(use_mmap=True))
         
-        si_daily = si_daily_cbm.merge(si_daily_qty, on='si_date_parsed', how='outer')
-        si_daily.columns = ['date', 'outbound_cbm_si', 'outbound_qty_si']
-        si_daily['date'] = si_daily['date'].astype(str)
+        columns = list(ANALYSIS_COLUMNS)
+        group_column = cls._find_group_column(dataset.schema.names, group_by) if group_by else None
+        if group_column:
+            columns.append(group_column)
         
-        # Create complete date range
-        date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-        daily_df = pd.DataFrame({'date': date_range.strftime('%Y-%m-%d')})
+        # Keep rows whose SO or SI date falls inside the requested days
+        start = pd.to_datetime(date_from)
+        end = pd.to_datetime(date_to) + pd.Timedelta(days=1)
+        so_in_range = (ds.field('so_date_parsed') >= start) & (ds.field('so_date_parsed') < end)
+        si_in_range = (ds.field('si_date_parsed') >= start) & (ds.field('si_date_parsed') < end)
         
-        # Merge inbound and outbound data
-        daily_df = daily_df.merge(so_daily, on='date', how='left')
-        daily_df = daily_df.merge(si_daily, on='date', how='left')
+        table = dataset.to_table(columns=columns, filter=so_in_range | si_in_range)
+        return cls(table.to_pandas())
+    
+    def analyze(self, date_from: str, date_to: str, group_by: Optional[str] = None) -> Dict[str, Any]:
+        """Analyze data within date range with optional grouping"""
         
-        # Fill NaN values with 0
-        daily_df['inbound_cbm'] = daily_df['inbound_cbm'].fillna(0)
-        daily_df['outbound_cbm_si'] = daily_df['outbound_cbm_si'].fillna(0)
-        daily_df['inbound_qty'] = daily_df['inbound_qty'].fillna(0)
-        daily_df['outbound_qty_si'] = daily_df['outbound_qty_si'].fillna(0)
+        # Convert date strings to datetime
+        start_date = pd.to_datetime(date_from)
+        end_date = pd.to_datetime(date_to)
         
-        # Calculate net flows
-        daily_df['net_flow_cbm'] = daily_df['inbound_cbm'] - daily_df['outbound_cbm_si']
-        daily_df['net_flow_qty'] = daily_df['inbound_qty'] - daily_df['outbound_qty_si']
+        # Create complete date range, formatted once as ISO strings
+        start_day = start_date.to_datetime64().astype('datetime64[D]')
+        end_day = end_date.to_datetime64().astype('datetime64[D]')
+        date_strs = np.datetime_as_string(np.arange(start_day, end_day + 1), unit='D').astype(object)
+        n_days = len(date_strs)
+        
+        # Aggregate inbound (SO) and outbound (SI) data by day offset
+        inbound_cbm, inbound_qty = self._sum_by_day(self._so_dates, self._so_cbm, self._so_qty, start_day, n_days)
+        outbound_cbm, outbound_qty = self._sum_by_day(self._si_dates, self._si_cbm, self._si_qty, start_day, n_days)
+        
+        # Build daily frame and calculate net flows
+        daily_df = pd.DataFrame({
+            'date': date_strs,
+            'inbound_cbm': inbound_cbm,
+            'inbound_qty': inbound_qty,
+            'outbound_cbm_si': outbound_cbm,
+            'outbound_qty_si': outbound_qty,
+            'net_flow_cbm': inbound_cbm - outbound_cbm,
+            'net_flow_qty': inbound_qty - outbound_qty
+        })
         
         # Calculate totals and KPIs
-        total_inbound_cbm = daily_df['inbound_cbm'].sum()
-        total_outbound_cbm = daily_df['outbound_cbm_si'].sum()
+        total_inbound_cbm = inbound_cbm.sum()
+        total_outbound_cbm = outbound_cbm.sum()
         total_net_flow_cbm = total_inbound_cbm - total_outbound_cbm
         
-        total_inbound_qty = daily_df['inbound_qty'].sum()
-        total_outbound_qty = daily_df['outbound_qty_si'].sum()
+        total_inbound_qty = inbound_qty.sum()
+        total_outbound_qty = outbound_qty.sum()
         total_net_flow_qty = total_inbound_qty - total_outbound_qty
         
-        # Find peak days
-        peak_inbound_cbm_day = daily_df.loc[daily_df['inbound_cbm'].idxmax()] if total_inbound_cbm > 0 else None
-        peak_outbound_cbm_day = daily_df.loc[daily_df['outbound_cbm_si'].idxmax()] if total_outbound_cbm > 0 else None
-        peak_inbound_qty_day = daily_df.loc[daily_df['inbound_qty'].idxmax()] if total_inbound_qty > 0 else None
-        peak_outbound_qty_day = daily_df.loc[daily_df['outbound_qty_si'].idxmax()] if total_outbound_qty > 0 else None
-        
         # Calculate average daily net flows
         non_zero_cbm_days = daily_df[daily_df['net_flow_cbm'] != 0]
         avg_daily_net_flow_cbm = non_zero_cbm_days['net_flow_cbm'].mean() if len(non_zero_cbm_days) > 0 else 0
@@ -89,8 +90,7 @@ class DataAnalyzer:
         # Handle grouping if requested
         grouped_data = None
         if group_by and group_by in ['warehouse', 'customer']:
-            # This would require additional columns in the Excel file
-            # For now, return None to indicate grouping not available
+            # None when the upload has no matching warehouse/customer column
             grouped_data = self._group_by_column(group_by, start_date, end_date)
         
         return {
@@ -104,73 +104,120 @@ class DataAnalyzer:
                 'total_net_flow_qty': round(total_net_flow_qty, 0)
             },
             'kpis': {
-                'peak_inbound_cbm_day': {
-                    'date': peak_inbound_cbm_day['date'] if peak_inbound_cbm_day is not None else None,
-                    'value': round(peak_inbound_cbm_day['inbound_cbm'], 6) if peak_inbound_cbm_day is not None else 0
-                },
-                'peak_outbound_cbm_day': {
-                    'date': peak_outbound_cbm_day['date'] if peak_outbound_cbm_day is not None else None,
-                    'value': round(peak_outbound_cbm_day['outbound_cbm_si'], 6) if peak_outbound_cbm_day is not None else 0
-                },
-                'peak_inbound_qty_day': {
-                    'date': peak_inbound_qty_day['date'] if peak_inbound_qty_day is not None else None,
-                    'value': round(peak_inbound_qty_day['inbound_qty'], 0) if peak_inbound_qty_day is not None else 0
-                },
-                'peak_outbound_qty_day': {
-                    'date': peak_outbound_qty_day['date'] if peak_outbound_qty_day is not None else None,
-                    'value': round(peak_outbound_qty_day['outbound_qty_si'], 0) if peak_outbound_qty_day is not None else 0
-                },
+                'peak_inbound_cbm_day': self._peak_day(date_strs, inbound_cbm, total_inbound_cbm, 6),
+                'peak_outbound_cbm_day': self._peak_day(date_strs, outbound_cbm, total_outbound_cbm, 6),
+                'peak_inbound_qty_day': self._peak_day(date_strs, inbound_qty, total_inbound_qty, 0),
+                'peak_outbound_qty_day': self._peak_day(date_strs, outbound_qty, total_outbound_qty, 0),
                 'avg_daily_net_flow_cbm': round(avg_daily_net_flow_cbm, 6),
                 'avg_daily_net_flow_qty': round(avg_daily_net_flow_qty, 0)
             },
             'grouped': grouped_data
         }
     
+    @staticmethod
+    def _peak_day(date_strs: np.ndarray, values: np.ndarray, total: float, ndigits: int) -> Dict[str, Any]:
+        """Return the date and value of the largest daily value"""
+        
+        if total <= 0:
+            return {'date': None, 'value': 0}
+        
+        i = int(np.argmax(values))
+        return {'date': date_strs[i], 'value': round(float(values[i]), ndigits)}
+    
+    @staticmethod
+    def _sorted_arrays(dates: ArrayLike, cbm: ArrayLike, qty: ArrayLike) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Drop undated rows and return day-precision dates with CBM and qty sorted by date"""
+        
+        days = np.asarray(dates).astype('datetime64[D]')
+        valid = np.flatnonzero(~np.isnat(days))
+        index = valid[np.argsort(days[valid], kind='stable')]
+        
+        def prepare(values: ArrayLike) -> np.ndarray:
+            # The gather returns a fresh array, so missing values can be zeroed in place
+            gathered = np.asarray(pd.to_numeric(values, errors='coerce'), dtype=np.float64)[index]
+            return np.nan_to_num(gathered, copy=False)
+        
+        return days[index], prepare(cbm), prepare(qty)
+    
+    @staticmethod
+    def _sum_by_day(dates: np.ndarray, cbm: np.ndarray, qty: np.ndarray,
+                    start_day: np.datetime64, n_days: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sum CBM and qty into dense per-day vectors starting at start_day"""
+        
+        # Dates are sorted, so the requested range is a contiguous slice
+        lo, hi = np.searchsorted(dates, [start_day, start_day + n_days])
+        offsets = (dates[lo:hi] - start_day).astype(np.int64)
+        
+        # Both metrics share the same day offsets
+        return (
+            np.bincount(offsets, weights=cbm[lo:hi], minlength=n_days).astype(np.float64, copy=False),
+            np.bincount(offsets, weights=qty[lo:hi], minlength=n_days).astype(np.float64, copy=False)
+        )
+    
+    @staticmethod
+    def _find_group_column(columns: List[str], group_by: str) -> Optional[str]:
+        """Find the first warehouse or customer column matching group_by"""
+        
+        for col in columns:
+            if group_by.lower() in str(col).lower():
+                return col
+        
+        return None
+    
     def _group_by_column(self, group_by: str, start_date: pd.Timestamp, end_date: pd.Timestamp) -> Optional[Dict]:
         """Group data by specified column if available"""
         
-        # Look for warehouse or customer columns
-        potential_columns = []
-        for col in self.data.columns:
-            col_lower = str(col).lower()
-            if group_by.lower() in col_lower:
-                potential_columns.append(col)
-        
-        if not potential_columns:
+        group_column = self._find_group_column(self.data.columns, group_by)
+        if group_column is None:
             return None
         
-        # Use the first matching column
-        group_column = potential_columns[0]
-        
-        # Filter data by date range
+        # Filter data by date range, keeping every time of day on the end date like the daily totals
+        end_bound = end_date + pd.Timedelta(days=1)
         so_mask = (
             self.data['so_date_parsed'].notna() & 
             (self.data['so_date_parsed'] >= start_date) & 
-            (self.data['so_date_parsed'] <= end_date)
+            (self.data['so_date_parsed'] < end_bound)
         )
         
         si_mask = (
             self.data['si_date_parsed'].notna() & 
             (self.data['si_date_parsed'] >= start_date) & 
-            (self.data['si_date_parsed'] <= end_date)
+            (self.data['si_date_parsed'] < end_bound)
         )
         
-        # Group inbound data
-        so_grouped_cbm = self.data[so_mask].groupby(group_column)['so_cbm_value'].sum().reset_index()
-        so_grouped_qty = self.data[so_mask].groupby(group_column)['so_qty_value'].sum().reset_index()
-        so_grouped = so_grouped_cbm.merge(so_grouped_qty, on=group_column, how='outer')
-        so_grouped.columns = [group_by, 'inbound_cbm', 'inbound_qty']
-        
-        # Group outbound data
-        si_grouped_cbm = self.data[si_mask].groupby(group_column)['si_cbm_value'].sum().reset_index()
-        si_grouped_qty = self.data[si_mask].groupby(group_column)['si_qty_value'].sum().reset_index()
-        si_grouped = si_grouped_cbm.merge(si_grouped_qty, on=group_column, how='outer')
-        si_grouped.columns = [group_by, 'outbound_cbm_si', 'outbound_qty_si']
-        
-        # Merge grouped data
-        grouped = so_grouped.merge(si_grouped, on=group_by, how='outer').fillna(0)
-        grouped['net_flow_cbm'] = grouped['inbound_cbm'] - grouped['outbound_cbm_si']
-        grouped['net_flow_qty'] = grouped['inbound_qty'] - grouped['outbound_qty_si']
+        so_mask = so_mask.to_numpy()
+        si_mask = si_mask.to_numpy()
+        
+        # Factorize the group column once; missing keys get code -1 and are skipped
+        groups = pd.Categorical(self.data[group_column])
+        codes = groups.codes
+        n_groups = len(groups.categories)
+        so_mask &= codes >= 0
+        si_mask &= codes >= 0
+        
+        def group_sums(mask: np.ndarray, column: str) -> np.ndarray:
+            values = pd.to_numeric(self.data[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            return np.bincount(codes[mask], weights=np.nan_to_num(values[mask]), minlength=n_groups)
+        
+        inbound_cbm = group_sums(so_mask, 'so_cbm_value')
+        inbound_qty = group_sums(so_mask, 'so_qty_value')
+        outbound_cbm = group_sums(si_mask, 'si_cbm_value')
+        outbound_qty = group_sums(si_mask, 'si_qty_value')
+        
+        # Only report groups with at least one row in the date range
+        present = np.zeros(n_groups, dtype=bool)
+        present[codes[so_mask]] = True
+        present[codes[si_mask]] = True
+        
+        grouped = pd.DataFrame({
+            group_by: groups.categories,
+            'inbound_cbm': inbound_cbm,
+            'inbound_qty': inbound_qty,
+            'outbound_cbm_si': outbound_cbm,
+            'outbound_qty_si': outbound_qty,
+            'net_flow_cbm': inbound_cbm - outbound_cbm,
+            'net_flow_qty': inbound_qty - outbound_qty
+        })[present]
         
         return {
             'group_by': group_by,
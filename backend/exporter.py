@@ -1,6 +1,6 @@
-import csv
 import io
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Iterator
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -11,31 +11,26 @@ from datetime import datetime
 class CSVExporter:
     """Export data to CSV format"""
     
-    def export(self, daily_data: List[Dict[str, Any]]) -> str:
-        """Export daily data to CSV string"""
-        
-        output = io.StringIO()
+    fieldnames = ['date', 'inbound_cbm', 'inbound_qty', 'outbound_cbm_si', 'outbound_qty_si', 'net_flow_cbm', 'net_flow_qty']
+    
+    def iter_rows(self, daily_data: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield daily data as CSV lines, header first"""
         
         if not daily_data:
-            return ""
-        
-        # Get field names from first record
-        fieldnames = list(daily_data[0].keys())
+            return
         
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+        yield ','.join(self.fieldnames) + '\n'
         
         for row in daily_data:
-            # Round numeric values for cleaner output
-            clean_row = {}
-            for key, value in row.items():
-                if isinstance(value, (int, float)) and key != 'date':
-                    clean_row[key] = round(value, 6)
-                else:
-                    clean_row[key] = value
-            writer.writerow(clean_row)
-        
-        return output.getvalue()
+            yield (
+                f"{row['date']},{row['inbound_cbm']:.6f},{row['inbound_qty']:.0f},"
+                f"{row['outbound_cbm_si']:.6f},{row['outbound_qty_si']:.0f},"
+                f"{row['net_flow_cbm']:.6f},{row['net_flow_qty']:.0f}\n"
+            )
+    
+    def export(self, daily_data: List[Dict[str, Any]]) -> str:
+        """Export daily data to CSV string"""
+        return ''.join(self.iter_rows(daily_data))
 
 class PDFExporter:
     """Export data to PDF format"""
@@ -50,6 +45,24 @@ class PDFExporter:
             alignment=1  # Center alignment
         )
         
+    @staticmethod
+    def _daily_rows(daily_data: List[Dict[str, Any]]) -> List[List[str]]:
+        """Format daily records as table cells, one vectorized pass per column"""
+        
+        def column(key: str, fmt: str) -> np.ndarray:
+            values = np.array([row.get(key, 0) for row in daily_data], dtype=np.float64)
+            return np.char.mod(fmt, values)
+        
+        return list(map(list, zip(
+            [row.get('date', '') for row in daily_data],
+            column('inbound_cbm', '%.6f'),
+            column('outbound_cbm_si', '%.6f'),
+            column('net_flow_cbm', '%.6f'),
+            column('inbound_qty', '%.0f'),
+            column('outbound_qty_si', '%.0f'),
+            column('net_flow_qty', '%.0f')
+        )))
+    
     def export(self, analysis_result: Dict[str, Any]) -> bytes:
         """Export analysis result to PDF"""
         
@@ -133,17 +146,7 @@ class PDFExporter:
             display_data = daily_data[:20]
             
             table_data = [['Date', 'Inbound CBM', 'Outbound CBM (SI)', 'Net Flow CBM', 'Inbound Qty', 'Outbound Qty (SI)', 'Net Flow Qty']]
-            
-            for row in display_data:
-                table_data.append([
-                    row.get('date', ''),
-                    f"{row.get('inbound_cbm', 0):.6f}",
-                    f"{row.get('outbound_cbm_si', 0):.6f}",
-                    f"{row.get('net_flow_cbm', 0):.6f}",
-                    f"{row.get('inbound_qty', 0):.0f}",
-                    f"{row.get('outbound_qty_si', 0):.0f}",
-                    f"{row.get('net_flow_qty', 0):.0f}"
-                ])
+            table_data.extend(self._daily_rows(display_data))
             
             daily_table = Table(table_data)
             daily_table.setStyle(TableStyle([
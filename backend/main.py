@@ -1,20 +1,25 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import pandas as pd
 import io
 import os
 import tempfile
 from datetime import datetime, date
+from collections import OrderedDict
+from uuid import uuid4
 import json
+import re
+import time
+import pyarrow as pa
 
 from parser import ExcelParser
 from analyzer import DataAnalyzer
 from exporter import CSVExporter, PDFExporter
 
-app = FastAPI(title="CBM Analytics API", version="1.0.0")
+app = FastAPI(title="CBM Analytics API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -25,13 +30,93 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global storage for uploaded data
+# Parsed uploads are stored as Arrow IPC files shared by all workers
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'uploads'))
+UPLOAD_TTL_SECONDS = int(os.getenv('UPLOAD_TTL_SECONDS', 86400))  # 24h default
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Most recent upload of this worker, used when a request omits upload_id
 uploaded_data = {}
 
+# Cache of analysis results keyed by (upload_id, date_from, date_to, group_by)
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 32))
+_analysis_cache = OrderedDict()
+
 class AnalyzeRequest(BaseModel):
     date_from: str
     date_to: str
     group_by: Optional[str] = None
+    upload_id: Optional[str] = None
+
+def _to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Convert the parsed frame to Arrow, storing mixed-type columns as strings"""
+    
+    frame = df.copy()
+    frame.columns = [str(col) for col in frame.columns]
+    for col in frame.select_dtypes(include='object').columns:
+        frame[col] = frame[col].astype('string')
+    
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+def _upload_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.arrow")
+
+def _write_upload(table: pa.Table) -> str:
+    """Write a parsed upload to the shared store and return its id"""
+    
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    
+    # Drop uploads written more than the TTL ago, plus temp files left by crashed writes
+    cutoff = time.time() - UPLOAD_TTL_SECONDS
+    for entry in os.scandir(UPLOAD_DIR):
+        if not entry.name.endswith(('.arrow', '.arrow.tmp')):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Another worker swept it first
+            pass
+    
+    upload_id = uuid4().hex
+    path = _upload_path(upload_id)
+    
+    # Write to a temporary name first so readers never see a partial file
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+    
+    return upload_id
+
+def _resolve_upload(upload_id: Optional[str]) -> Optional[str]:
+    """Return the requested upload id, or this worker's latest upload, if it is stored"""
+    
+    upload_id = upload_id or uploaded_data.get('upload_id')
+    if not upload_id or not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        return None
+    if not os.path.exists(_upload_path(upload_id)):
+        return None
+    
+    return upload_id
+
+def _get_analysis(upload_id: str, date_from: str, date_to: str, group_by: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+    """Return the analysis result for an upload, computing it at most once, and whether it was cached"""
+    
+    key = (upload_id, date_from, date_to, group_by)
+    result = _analysis_cache.get(key)
+    if result is not None:
+        _analysis_cache.move_to_end(key)
+        return result, True
+    
+    analyzer = DataAnalyzer.from_arrow(_upload_path(upload_id), date_from, date_to, group_by)
+    result = analyzer.analyze(date_from, date_to, group_by)
+    
+    _analysis_cache[key] = result
+    if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _analysis_cache.popitem(last=False)
+    
+    return result, False
 
 @app.post("/api/upload")
 async def upload_file(file: UploadFile = File(...)):
@@ -54,13 +139,13 @@ async def upload_file(file: UploadFile = File(...)):
         parser = ExcelParser()
         result = parser.parse_excel(content)
         
-        # Store parsed data globally (in production, use proper storage)
-        uploaded_data['data'] = result['data']
-        uploaded_data['columns'] = result['columns']
-        uploaded_data['date_range'] = result['date_range']
+        # Persist parsed data to the shared store keyed by upload id
+        upload_id = _write_upload(_to_arrow_table(result['data']))
+        uploaded_data['upload_id'] = upload_id
         
         return {
             "status": "success",
+            "upload_id": upload_id,
             "filename": file.filename,
             "columns_detected": result['columns'],
             "sample_rows": result['sample_rows'],
@@ -75,18 +160,15 @@ async def upload_file(file: UploadFile = File(...)):
 async def analyze_data(request: AnalyzeRequest):
     """Analyze uploaded data with date filtering and grouping"""
     
-    if 'data' not in uploaded_data:
+    upload_id = _resolve_upload(request.upload_id)
+    if upload_id is None:
         raise HTTPException(status_code=400, detail="No data uploaded. Please upload a file first.")
     
     try:
-        analyzer = DataAnalyzer(uploaded_data['data'])
-        result = analyzer.analyze(
-            date_from=request.date_from,
-            date_to=request.date_to,
-            group_by=request.group_by
-        )
+        result, cached = _get_analysis(upload_id, request.date_from, request.date_to, request.group_by)
         
-        return result
+        # Return the response directly to skip jsonable_encoder on the daily records
+        return ORJSONResponse(result, headers={"X-Cache": "HIT" if cached else "MISS"})
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -95,22 +177,22 @@ async def analyze_data(request: AnalyzeRequest):
 async def download_csv(
     date_from: str = Query(...),
     date_to: str = Query(...),
-    group_by: Optional[str] = Query(None)
+    group_by: Optional[str] = Query(None),
+    upload_id: Optional[str] = Query(None)
 ):
     """Export data as CSV"""
     
-    if 'data' not in uploaded_data:
+    upload_id = _resolve_upload(upload_id)
+    if upload_id is None:
         raise HTTPException(status_code=400, detail="No data uploaded")
     
     try:
-        analyzer = DataAnalyzer(uploaded_data['data'])
-        result = analyzer.analyze(date_from, date_to, group_by)
+        result, _ = _get_analysis(upload_id, date_from, date_to, group_by)
         
         exporter = CSVExporter()
-        csv_content = exporter.export(result['daily'])
         
         return StreamingResponse(
-            io.StringIO(csv_content),
+            exporter.iter_rows(result['daily']),
             media_type="text/csv",
             headers={"Content-Disposition": "attachment; filename=cbm_analysis.csv"}
         )
@@ -122,12 +204,12 @@ async def download_csv(
 async def download_pdf(request: AnalyzeRequest):
     """Export summary as PDF"""
     
-    if 'data' not in uploaded_data:
+    upload_id = _resolve_upload(request.upload_id)
+    if upload_id is None:
         raise HTTPException(status_code=400, detail="No data uploaded")
     
     try:
-        analyzer = DataAnalyzer(uploaded_data['data'])
-        result = analyzer.analyze(request.date_from, request.date_to, request.group_by)
+        result, _ = _get_analysis(upload_id, request.date_from, request.date_to, request.group_by)
         
         exporter = PDFExporter()
         pdf_content = exporter.export(result)
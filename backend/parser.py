@@ -1,9 +1,27 @@
+import numpy as np
 import pandas as pd
 import io
 from typing import Dict, List, Any, Optional
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
 import re
-from datetime import datetime
+from datetime import date, datetime
+
+def _select_excel_engine() -> str:
+    """Prefer the Rust calamine reader; pandas already opens the openpyxl fallback read-only"""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return 'openpyxl'
+    return 'calamine'
+
+EXCEL_ENGINE = _select_excel_engine()
+
+# Excel serial day numbers: 1970-01-01 and the last day that fits in a nanosecond Timestamp
+UNIX_EPOCH_SERIAL = 25569
+MAX_EXCEL_SERIAL = (pd.Timestamp.max.date() - date(1899, 12, 30)).days
+
+# Parsed columns consumed by DataAnalyzer
+ANALYSIS_COLUMNS = ['so_date_parsed', 'si_date_parsed', 'so_cbm_value', 'si_cbm_value', 'so_qty_value', 'si_qty_value']
 
 class ExcelParser:
     """Parse Excel files and detect required columns"""
@@ -25,13 +43,20 @@ class ExcelParser:
             return ""
         return re.sub(r'[^a-z0-9]', '', str(name).lower())
     
-    def find_column_match(self, columns: List[str], target_patterns: List[str]) -> Optional[str]:
+    def normalize_columns(self, columns: List[str]) -> Dict[str, str]:
+        """Map normalized column names to their original names"""
+        return {self.normalize_column_name(col): col for col in columns}
+    
+    def find_column_match(self, columns: List[str], target_patterns: List[str],
+                          normalized_columns: Optional[Dict[str, str]] = None) -> Optional[str]:
         """Find best matching column using fuzzy matching"""
-        normalized_columns = {self.normalize_column_name(col): col for col in columns}
+        if normalized_columns is None:
+            normalized_columns = self.normalize_columns(columns)
+        
+        normalized_patterns = [self.normalize_column_name(pattern) for pattern in target_patterns]
         
         # Try exact match first
-        for pattern in target_patterns:
-            normalized_pattern = self.normalize_column_name(pattern)
+        for normalized_pattern in normalized_patterns:
             if normalized_pattern in normalized_columns:
                 return normalized_columns[normalized_pattern]
         
@@ -39,12 +64,16 @@ class ExcelParser:
         best_match = None
         best_score = 0
         
-        for pattern in target_patterns:
-            for norm_col, orig_col in normalized_columns.items():
-                score = fuzz.ratio(self.normalize_column_name(pattern), norm_col)
-                if score > best_score and score >= 80:  # 80% similarity threshold
-                    best_score = score
-                    best_match = orig_col
+        for normalized_pattern in normalized_patterns:
+            match = process.extractOne(
+                normalized_pattern,
+                normalized_columns.keys(),
+                scorer=fuzz.ratio,
+                score_cutoff=80  # 80% similarity threshold
+            )
+            if match and match[1] > best_score:
+                best_score = match[1]
+                best_match = normalized_columns[match[0]]
         
         return best_match
     
@@ -53,21 +82,30 @@ class ExcelParser:
         if date_column not in df.columns:
             return pd.Series(dtype='datetime64[ns]')
         
+        values = df[date_column]
+        
+        # Numeric cells are Excel serials; to_datetime would read them as epoch nanoseconds
+        if pd.api.types.is_numeric_dtype(values):
+            numeric = np.ones(len(values), dtype=bool)
+        else:
+            numeric = values.map(pd.api.types.is_number).to_numpy(dtype=bool)
+        text = values.mask(numeric)
+        n_text = len(values) - int(numeric.sum())
+        
         # Try pandas to_datetime with dayfirst=True
-        dates = pd.to_datetime(df[date_column], errors='coerce', dayfirst=True)
+        dates = pd.to_datetime(text, errors='coerce', dayfirst=True)
         
-        # If many NaT values, try without dayfirst
-        if dates.isna().sum() > len(dates) * 0.5:
-            dates = pd.to_datetime(df[date_column], errors='coerce', dayfirst=False)
+        # If many text cells fail, try without dayfirst
+        if dates[~numeric].isna().sum() > n_text * 0.5:
+            dates = pd.to_datetime(text, errors='coerce', dayfirst=False)
         
-        # Handle Excel serial dates
-        mask = dates.isna() & df[date_column].notna()
+        # Handle Excel serial dates (day 0 is 1899-12-30); offsets are taken from the Unix epoch
+        # because nanosecond offsets from 1899 overflow int64 long before pd.Timestamp.max
+        serials = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        mask = dates.isna().to_numpy() & (serials >= 0) & (serials <= MAX_EXCEL_SERIAL)
         if mask.any():
-            try:
-                excel_dates = pd.to_datetime('1899-12-30') + pd.to_timedelta(df.loc[mask, date_column], 'D')
-                dates.loc[mask] = excel_dates
-            except:
-                pass
+            nanos = np.round((serials[mask] - UNIX_EPOCH_SERIAL) * 86_400_000_000_000).astype(np.int64)
+            dates.loc[mask] = nanos.view('datetime64[ns]')
         
         return dates
     
@@ -76,28 +114,38 @@ class ExcelParser:
         
         try:
             # Read Excel file
-            df = pd.read_excel(io.BytesIO(content))
+            df = pd.read_excel(
+                io.BytesIO(content),
+                engine=EXCEL_ENGINE
+            )
             
             if df.empty:
                 raise ValueError("Excel file is empty")
             
             # Detect columns
             columns = list(df.columns)
+            normalized_columns = self.normalize_columns(columns)
             detected_columns = {}
             
+            # Match every target column once
+            matches = {
+                key: self.find_column_match(columns, patterns, normalized_columns)
+                for key, patterns in self.required_columns.items()
+            }
+            
             # Find required columns
-            so_date_col = self.find_column_match(columns, self.required_columns['so_date'])
-            so_cbm_col = self.find_column_match(columns, self.required_columns['so_total_cbm'])
-            si_date_col = self.find_column_match(columns, self.required_columns['si_date'])
-            si_cbm_col = self.find_column_match(columns, self.required_columns['si_total_cbm'])
+            so_date_col = matches['so_date']
+            so_cbm_col = matches['so_total_cbm']
+            si_date_col = matches['si_date']
+            si_cbm_col = matches['si_total_cbm']
             
             # Check for required columns
             if not so_date_col:
                 raise ValueError("SO Date column not found. Required for inbound analysis.")
             if not so_cbm_col:
                 # Try fallback with per unit CBM and quantity
-                per_unit_col = self.find_column_match(columns, self.required_columns['per_unit_cbm'])
-                so_qty_col = self.find_column_match(columns, self.required_columns['so_qty'])
+                per_unit_col = matches['per_unit_cbm']
+                so_qty_col = matches['so_qty']
                 if not (per_unit_col and so_qty_col):
                     raise ValueError("SO Total CBM column not found and cannot compute from Per Unit CBM * Qty")
                 detected_columns['so_cbm_computed'] = True
@@ -117,8 +165,8 @@ class ExcelParser:
             df['si_date_parsed'] = self.parse_dates(df, si_date_col)
             
             # Find quantity columns
-            so_qty_col = self.find_column_match(columns, self.required_columns['so_qty'])
-            si_qty_col = self.find_column_match(columns, self.required_columns['si_qty'])
+            so_qty_col = matches['so_qty']
+            si_qty_col = matches['si_qty']
             
             detected_columns.update({
                 'so_qty': so_qty_col,
@@ -130,7 +178,7 @@ class ExcelParser:
                 df['so_cbm_value'] = pd.to_numeric(df[so_cbm_col], errors='coerce')
             else:
                 # Compute from per unit CBM * quantity
-                per_unit_col = self.find_column_match(columns, self.required_columns['per_unit_cbm'])
+                per_unit_col = matches['per_unit_cbm']
                 if per_unit_col and so_qty_col:
                     df['so_cbm_value'] = (
                         pd.to_numeric(df[per_unit_col], errors='coerce') * 
@@ -144,7 +192,7 @@ class ExcelParser:
                 df['si_cbm_value'] = pd.to_numeric(df[si_cbm_col], errors='coerce')
             else:
                 # Try fallback computation
-                per_unit_col = self.find_column_match(columns, self.required_columns['per_unit_cbm'])
+                per_unit_col = matches['per_unit_cbm']
                 if per_unit_col and si_qty_col:
                     df['si_cbm_value'] = (
                         pd.to_numeric(df[per_unit_col], errors='coerce') * 
@@ -180,8 +228,9 @@ class ExcelParser:
                 'max_date': all_dates.max().strftime('%Y-%m-%d') if not all_dates.empty else None
             }
             
-            # Sample rows for preview
-            sample_rows = df.head(5).fillna('').to_dict('records')
+            # Sample rows for preview, with NaN/NaT/NA blanked for JSON
+            sample = df.head(5).astype(object)
+            sample_rows = sample.where(sample.notna(), '').to_dict('records')
             
             return {
                 'data': df,
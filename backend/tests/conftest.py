@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+from tests.helpers import EXACT_DATA, write_only_xlsx, xlsx_upload
+
+@pytest.fixture(scope="session", autouse=True)
+def upload_dir(tmp_path_factory):
+    """Keep uploads in a per-session (per xdist worker) temp dir instead of the shared system one"""
+    path = str(tmp_path_factory.mktemp('uploads'))
+    with pytest.MonkeyPatch.context() as mp:
+        # main reads UPLOAD_DIR at import; patch the module too in case it is already loaded
+        mp.setenv('UPLOAD_DIR', path)
+        if 'main' in sys.modules:
+            mp.setattr(sys.modules['main'], 'UPLOAD_DIR', path)
+        yield path
+
+@pytest.fixture(scope="session")
+def client(upload_dir):
+    """One TestClient for the session; entering it runs the app lifespan once"""
+    # Imported here so parser/analyzer-only runs never load the FastAPI app
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def exact_data():
+    """Columns of the prompt's sample rows"""
+    return EXACT_DATA
+
+@pytest.fixture(scope="session")
+def standard_upload(client, exact_data):
+    """Upload the exact prompt data once per session; run xdist with --dist=loadfile so a file's tests share it"""
+    response = client.post("/api/upload", files=xlsx_upload(write_only_xlsx(exact_data)))
+
+    assert response.status_code == 200
+    return response.json()
+
+@pytest.fixture(autouse=True)
+def isolate_state():
+    """Start each test with no latest upload and an empty analysis cache"""
+    main = sys.modules.get('main')
+    if main is not None:
+        main.uploaded_data.clear()
+        main._analysis_cache.clear()
+    yield
@@ -0,0 +1,41 @@
+"""Workbook builders and shared test data; fixtures live in conftest.py"""
+
+import io
+
+import pandas as pd
+from openpyxl import Workbook
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def build_xlsx(data):
+    """Serialize a dict of columns to xlsx bytes with the xlsxwriter engine"""
+    buffer = io.BytesIO()
+    pd.DataFrame(data).to_excel(buffer, index=False, engine='xlsxwriter')
+    return buffer.getvalue()
+
+def write_only_xlsx(data):
+    """Serialize a dict of columns to xlsx bytes with openpyxl's write-only workbook, skipping pandas' writer"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(data))
+    for row in zip(*data.values()):
+        sheet.append(row)
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def xlsx_upload(content):
+    """Upload form for cached xlsx bytes; a fresh BytesIO per request shares the bytes instead of copying them"""
+    return {"file": ("test.xlsx", io.BytesIO(content), XLSX_CONTENT_TYPE)}
+
+# Test data matching the prompt's expected values
+EXACT_DATA = {
+    'SO Date': ['2025-09-15', '2025-09-15', '2025-09-15'],
+    'SO Total CBM': [22.123456, 33.456789, 10.437627],
+    'Sales Invoice Date': ['2025-09-16', '2025-09-17', '2025-09-18'],
+    'SI Total CBM': [25.123456, 30.456789, 10.437627],
+    'Per Unit CBM': [2.5, 3.0, 2.1],
+    'Sales Order Qty': [8, 11, 5],
+    'Sales Invoice Qty': [10, 10, 5]
+}
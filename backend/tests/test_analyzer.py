@@ -1,38 +1,45 @@
+import re
 import pytest
+import numpy as np
 import pandas as pd
-from datetime import datetime, date
+from datetime import date
 from analyzer import DataAnalyzer
 
+# Parsed once at import instead of one Timestamp per value
+_SO_DATES = pd.to_datetime(['2023-01-15', '2023-01-16', '2023-01-17', '2023-01-18'])
+_SI_DATES = pd.to_datetime(['2023-01-16', '2023-01-17', '2023-01-18', '2023-01-19'])
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
 class TestDataAnalyzer:
     
-    def create_test_data(self):
-        """Create test DataFrame for analysis"""
+    @pytest.fixture(scope="class")
+    def test_data(self):
+        """Create the test DataFrame once for the whole class"""
         data = {
-            'so_date_parsed': [
-                pd.Timestamp('2023-01-15'),
-                pd.Timestamp('2023-01-16'),
-                pd.Timestamp('2023-01-17'),
-                pd.Timestamp('2023-01-18')
-            ],
+            'so_date_parsed': _SO_DATES,
             'so_cbm_value': [10.5, 15.2, 8.7, 12.3],
-            'si_date_parsed': [
-                pd.Timestamp('2023-01-16'),
-                pd.Timestamp('2023-01-17'),
-                pd.Timestamp('2023-01-18'),
-                pd.Timestamp('2023-01-19')
-            ],
-            'si_cbm_value': [12.3, 9.8, 11.1, 7.5]
+            'so_qty_value': [5, 4, 3, 6],
+            'si_date_parsed': _SI_DATES,
+            'si_cbm_value': [12.3, 9.8, 11.1, 7.5],
+            'si_qty_value': [6, 2, 4, 3]
         }
         
         return pd.DataFrame(data)
     
-    def setup_method(self):
-        self.test_data = self.create_test_data()
-        self.analyzer = DataAnalyzer(self.test_data)
+    @pytest.fixture(scope="class")
+    def analyzer(self, test_data):
+        """Shared analyzer; tests that need different data build their own"""
+        return DataAnalyzer(test_data)
+    
+    @pytest.fixture(scope="class")
+    def full_range_result(self, analyzer):
+        """Analysis of the full test date range, shared by the structure tests"""
+        return analyzer.analyze('2023-01-15', '2023-01-19')
     
-    def test_analyze_basic(self):
+    def test_analyze_basic(self, full_range_result):
         """Test basic analysis functionality"""
-        result = self.analyzer.analyze('2023-01-15', '2023-01-19')
+        result = full_range_result
         
         # Check structure
         assert 'daily' in result
@@ -47,12 +54,12 @@ class TestDataAnalyzer:
         totals = result['totals']
         assert totals['total_inbound_cbm'] == 46.7  # Sum of SO CBM
         assert totals['total_outbound_cbm_si'] == 40.7  # Sum of SI CBM
-        assert totals['total_net_flow'] == 6.0  # 46.7 - 40.7
+        assert totals['total_net_flow_cbm'] == 6.0  # 46.7 - 40.7
     
-    def test_analyze_date_filtering(self):
+    def test_analyze_date_filtering(self, analyzer):
         """Test date range filtering"""
         # Analyze only 2 days
-        result = self.analyzer.analyze('2023-01-16', '2023-01-17')
+        result = analyzer.analyze('2023-01-16', '2023-01-17')
         
         daily = result['daily']
         assert len(daily) == 2  # Only 2 days
@@ -62,46 +69,46 @@ class TestDataAnalyzer:
         assert totals['total_inbound_cbm'] == 23.9  # 15.2 + 8.7
         assert totals['total_outbound_cbm_si'] == 22.1  # 12.3 + 9.8
     
-    def test_analyze_kpis(self):
+    def test_analyze_kpis(self, full_range_result):
         """Test KPI calculations"""
-        result = self.analyzer.analyze('2023-01-15', '2023-01-19')
+        result = full_range_result
         
         kpis = result['kpis']
         
         # Check peak inbound day
-        peak_inbound = kpis['peak_inbound_day']
+        peak_inbound = kpis['peak_inbound_cbm_day']
         assert peak_inbound['date'] == '2023-01-16'
         assert peak_inbound['value'] == 15.2
         
         # Check peak outbound day
-        peak_outbound = kpis['peak_outbound_day']
+        peak_outbound = kpis['peak_outbound_cbm_day']
         assert peak_outbound['date'] == '2023-01-16'
         assert peak_outbound['value'] == 12.3
         
         # Check average daily net flow
-        assert 'avg_daily_net_flow' in kpis
+        assert 'avg_daily_net_flow_cbm' in kpis
     
-    def test_analyze_empty_date_range(self):
+    def test_analyze_empty_date_range(self, analyzer):
         """Test analysis with date range that has no data"""
-        result = self.analyzer.analyze('2023-02-01', '2023-02-05')
+        result = analyzer.analyze('2023-02-01', '2023-02-05')
         
         daily = result['daily']
         assert len(daily) == 5  # 5 days in range
         
         # All values should be 0
-        for day in daily:
-            assert day['inbound_cbm'] == 0
-            assert day['outbound_cbm_si'] == 0
-            assert day['net_flow'] == 0
+        assert all(
+            day['inbound_cbm'] == 0 and day['outbound_cbm_si'] == 0 and day['net_flow_cbm'] == 0
+            for day in daily
+        )
         
         totals = result['totals']
         assert totals['total_inbound_cbm'] == 0
         assert totals['total_outbound_cbm_si'] == 0
-        assert totals['total_net_flow'] == 0
+        assert totals['total_net_flow_cbm'] == 0
     
-    def test_analyze_single_day(self):
+    def test_analyze_single_day(self, analyzer):
         """Test analysis for a single day"""
-        result = self.analyzer.analyze('2023-01-16', '2023-01-16')
+        result = analyzer.analyze('2023-01-16', '2023-01-16')
         
         daily = result['daily']
         assert len(daily) == 1
@@ -110,24 +117,30 @@ class TestDataAnalyzer:
         assert day_data['date'] == '2023-01-16'
         assert day_data['inbound_cbm'] == 15.2
         assert day_data['outbound_cbm_si'] == 12.3
-        assert day_data['net_flow'] == 2.9
+        assert day_data['net_flow_cbm'] == pytest.approx(2.9)
     
-    def test_analyze_net_flow_calculation(self):
+    def test_analyze_net_flow_calculation(self, full_range_result):
         """Test net flow calculation"""
-        result = self.analyzer.analyze('2023-01-15', '2023-01-19')
+        result = full_range_result
         
         daily = result['daily']
         
-        for day in daily:
-            expected_net_flow = day['inbound_cbm'] - day['outbound_cbm_si']
-            assert abs(day['net_flow'] - expected_net_flow) < 0.001
+        inbound = np.array([day['inbound_cbm'] for day in daily])
+        outbound = np.array([day['outbound_cbm_si'] for day in daily])
+        net_flow = np.array([day['net_flow_cbm'] for day in daily])
+        assert net_flow == pytest.approx(inbound - outbound, abs=1e-3)
     
     def test_analyze_with_missing_data(self):
         """Test analysis with missing data points"""
         # Create data with some NaN values
-        data = self.test_data.copy()
-        data.loc[1, 'so_cbm_value'] = None
-        data.loc[2, 'si_cbm_value'] = None
+        data = pd.DataFrame({
+            'so_date_parsed': _SO_DATES,
+            'so_cbm_value': [10.5, np.nan, 8.7, 12.3],
+            'so_qty_value': [5, 4, np.nan, 6],
+            'si_date_parsed': _SI_DATES,
+            'si_cbm_value': [12.3, 9.8, np.nan, 7.5],
+            'si_qty_value': [6, np.nan, 4, 3]
+        })
         
         analyzer = DataAnalyzer(data)
         result = analyzer.analyze('2023-01-15', '2023-01-19')
@@ -136,18 +149,25 @@ class TestDataAnalyzer:
         assert 'daily' in result
         assert 'totals' in result
     
-    def test_group_by_column_not_found(self):
+    def test_group_by_column_not_found(self, analyzer):
         """Test grouping when column doesn't exist"""
-        result = self.analyzer.analyze('2023-01-15', '2023-01-19', group_by='warehouse')
+        result = analyzer.analyze('2023-01-15', '2023-01-19', group_by='warehouse')
         
         # Should return None for grouped data when column not found
         assert result['grouped'] is None
     
     def test_group_by_column_exists(self):
         """Test grouping when column exists"""
-        # Add warehouse column to test data
-        data = self.test_data.copy()
-        data['Warehouse A'] = ['WH1', 'WH2', 'WH1', 'WH2']
+        # Test data with a warehouse column
+        data = pd.DataFrame({
+            'so_date_parsed': _SO_DATES,
+            'so_cbm_value': [10.5, 15.2, 8.7, 12.3],
+            'so_qty_value': [5, 4, 3, 6],
+            'si_date_parsed': _SI_DATES,
+            'si_cbm_value': [12.3, 9.8, 11.1, 7.5],
+            'si_qty_value': [6, 2, 4, 3],
+            'Warehouse A': ['WH1', 'WH2', 'WH1', 'WH2']
+        })
         
         analyzer = DataAnalyzer(data)
         result = analyzer.analyze('2023-01-15', '2023-01-19', group_by='warehouse')
@@ -157,30 +177,44 @@ class TestDataAnalyzer:
         assert result['grouped']['group_by'] == 'warehouse'
         assert 'data' in result['grouped']
     
-    def test_rounding_precision(self):
+    def test_group_by_includes_end_day_times(self):
+        """Test that grouped sums match the daily totals when the end day has timestamps"""
+        data = pd.DataFrame({
+            'so_date_parsed': pd.to_datetime(['2023-01-15 08:00', '2023-01-16 17:30']),
+            'so_cbm_value': [10.5, 15.2],
+            'so_qty_value': [5, 4],
+            'si_date_parsed': pd.to_datetime(['2023-01-15 12:00', '2023-01-16 23:59']),
+            'si_cbm_value': [12.3, 9.8],
+            'si_qty_value': [6, 2],
+            'Warehouse A': ['WH1', 'WH2']
+        })
+        
+        analyzer = DataAnalyzer(data)
+        result = analyzer.analyze('2023-01-15', '2023-01-16', group_by='warehouse')
+        
+        grouped = result['grouped']['data']
+        totals = result['totals']
+        assert len(grouped) == 2
+        assert sum(row['inbound_cbm'] for row in grouped) == pytest.approx(totals['total_inbound_cbm'])
+        assert sum(row['outbound_cbm_si'] for row in grouped) == pytest.approx(totals['total_outbound_cbm_si'])
+        assert sum(row['inbound_qty'] for row in grouped) == totals['total_inbound_qty']
+    
+    def test_rounding_precision(self, full_range_result):
         """Test that values are properly rounded"""
-        result = self.analyzer.analyze('2023-01-15', '2023-01-19')
+        result = full_range_result
         
         # Check that totals are rounded to 6 decimal places
         totals = result['totals']
-        for key, value in totals.items():
+        for value in totals.values():
             # Should not have more than 6 decimal places
-            str_value = str(value)
-            if '.' in str_value:
-                decimal_places = len(str_value.split('.')[1])
-                assert decimal_places <= 6
+            assert value == round(value, 6)
     
-    def test_date_string_format(self):
+    def test_date_string_format(self, full_range_result):
         """Test that dates are returned as strings in correct format"""
-        result = self.analyzer.analyze('2023-01-15', '2023-01-19')
+        result = full_range_result
         
         daily = result['daily']
         for day in daily:
             date_str = day['date']
-            # Should be in YYYY-MM-DD format
-            assert len(date_str) == 10
-            assert date_str[4] == '-'
-            assert date_str[7] == '-'
-            
-            # Should be parseable as date
-            datetime.strptime(date_str, '%Y-%m-%d')
\ No newline at end of file
+            # Should be in YYYY-MM-DD format and parseable as a date
+            assert _ISO_DATE.match(date_str) and date.fromisoformat(date_str)
\ No newline at end of file
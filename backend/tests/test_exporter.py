@@ -0,0 +1,69 @@
+import pytest
+from exporter import CSVExporter, PDFExporter
+
+# Two days in the analyzer's daily record layout, with a value that needs rounding and negative net flows
+_DAILY = [
+    {
+        'date': '2025-09-15',
+        'inbound_cbm': 66.017872,
+        'inbound_qty': 24.0,
+        'outbound_cbm_si': 0.0,
+        'outbound_qty_si': 0.0,
+        'net_flow_cbm': 66.017872,
+        'net_flow_qty': 24.0
+    },
+    {
+        'date': '2025-09-16',
+        'inbound_cbm': 0.0,
+        'inbound_qty': 0.0,
+        'outbound_cbm_si': 25.1234564,
+        'outbound_qty_si': 10.0,
+        'net_flow_cbm': -25.1234564,
+        'net_flow_qty': -10.0
+    }
+]
+
+class TestCSVExporter:
+
+    @pytest.fixture(scope="class")
+    def exporter(self):
+        return CSVExporter()
+
+    def test_iter_rows(self, exporter):
+        """Test the exact header, column order and number formats"""
+        assert list(exporter.iter_rows(_DAILY)) == [
+            'date,inbound_cbm,inbound_qty,outbound_cbm_si,outbound_qty_si,net_flow_cbm,net_flow_qty\n',
+            '2025-09-15,66.017872,24,0.000000,0,66.017872,24\n',
+            '2025-09-16,0.000000,0,25.123456,10,-25.123456,-10\n'
+        ]
+
+    def test_iter_rows_empty(self, exporter):
+        """Test that no rows produce no output, not even a header"""
+        assert list(exporter.iter_rows([])) == []
+        assert exporter.export([]) == ''
+
+    def test_export_joins_rows(self, exporter):
+        """Test that export returns the streamed rows as one string"""
+        assert exporter.export(_DAILY) == ''.join(exporter.iter_rows(_DAILY))
+
+class TestPDFExporter:
+
+    def test_daily_rows_match_per_row_formatting(self):
+        """Test that the vectorized daily table cells equal the per-row f-string formatting"""
+        # A sparse record falls back to 0 for every missing metric
+        daily = _DAILY + [{'date': '2025-09-17', 'inbound_cbm': 1.0000005, 'inbound_qty': 3.5}]
+
+        expected = [
+            [
+                row.get('date', ''),
+                f"{row.get('inbound_cbm', 0):.6f}",
+                f"{row.get('outbound_cbm_si', 0):.6f}",
+                f"{row.get('net_flow_cbm', 0):.6f}",
+                f"{row.get('inbound_qty', 0):.0f}",
+                f"{row.get('outbound_qty_si', 0):.0f}",
+                f"{row.get('net_flow_qty', 0):.0f}"
+            ]
+            for row in daily
+        ]
+
+        assert PDFExporter._daily_rows(daily) == expected
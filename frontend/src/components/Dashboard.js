@@ -25,7 +25,8 @@ const Dashboard = ({ uploadedData, isLoading, setIsLoading }) => {
       const response = await axios.post('/api/analyze', {
         date_from: dateRange.from,
         date_to: dateRange.to,
-        group_by: groupBy
+        group_by: groupBy,
+        upload_id: uploadedData.upload_id
       });
 
       setAnalysisData(response.data);
@@ -120,6 +121,7 @@ const Dashboard = ({ uploadedData, isLoading, setIsLoading }) => {
           />
           
           <ExportButtons
+            uploadId={uploadedData.upload_id}
             dateRange={dateRange}
             groupBy={groupBy}
             disabled={isLoading || !analysisData}
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import axios from 'axios';
 
-const ExportButtons = ({ dateRange, groupBy, disabled }) => {
+const ExportButtons = ({ uploadId, dateRange, groupBy, disabled }) => {
   const [isExporting, setIsExporting] = useState({ csv: false, pdf: false });
 
   const downloadFile = (blob, filename) => {
@@ -23,7 +23,8 @@ const ExportButtons = ({ dateRange, groupBy, disabled }) => {
       const params = new URLSearchParams({
         date_from: dateRange.from,
         date_to: dateRange.to,
-        ...(groupBy && { group_by: groupBy })
+        ...(groupBy && { group_by: groupBy }),
+        ...(uploadId && { upload_id: uploadId })
       });
 
       const response = await axios.get(`/api/download/csv?${params}`, {
@@ -46,7 +47,8 @@ const ExportButtons = ({ dateRange, groupBy, disabled }) => {
       const response = await axios.post('/api/download/pdf', {
         date_from: dateRange.from,
         date_to: dateRange.to,
-        group_by: groupBy
+        group_by: groupBy,
+        upload_id: uploadId
       }, {
         responseType: 'blob'
       });
@@ -39,6 +39,7 @@ jest.mock('../ExportButtons', () => {
 
 describe('Dashboard Component', () => {
   const mockUploadedData = {
+    upload_id: '0123456789abcdef0123456789abcdef',
     filename: 'test.xlsx',
     total_rows: 100,
     date_range: {
@@ -146,7 +147,8 @@ describe('Dashboard Component', () => {
       expect(mockedAxios.post).toHaveBeenCalledWith('/api/analyze', {
         date_from: expect.any(String),
         date_to: expect.any(String),
-        group_by: null
+        group_by: null,
+        upload_id: mockUploadedData.upload_id
       });
     });
   });
@@ -4,101 +4,74 @@ Create a sample Excel file for testing the CBM Analytics application.
 This script generates realistic test data with the expected column structure.
 """
 
+import argparse
+from pathlib import Path
+
 import pandas as pd
-from datetime import datetime, timedelta
-import random
 import numpy as np
+import xlsxwriter
+
+# Generated workbooks are committed next to this script
+OUTPUT_DIR = Path(__file__).resolve().parent
 
-def create_sample_data():
-    """Create sample CBM data"""
-    
-    # Generate date range
-    start_date = datetime(2025, 9, 1)
-    end_date = datetime(2025, 9, 30)
-    
-    # Generate sample data
-    data = []
-    
-    for i in range(100):  # 100 sample rows
-        # Sales Order data
-        so_date = start_date + timedelta(days=random.randint(0, 29))
-        so_cbm = round(random.uniform(5.0, 50.0), 6)
-        
-        # Sales Invoice data (usually 1-3 days after SO)
-        si_date = so_date + timedelta(days=random.randint(1, 3))
-        si_cbm = round(random.uniform(3.0, 45.0), 6)
-        
-        # Additional fields
-        per_unit_cbm = round(random.uniform(1.0, 5.0), 6)
-        so_qty = random.randint(1, 20)
-        si_qty = random.randint(1, 15)
-        
-        # Customer and warehouse (optional grouping fields)
-        customers = ['Customer A', 'Customer B', 'Customer C', 'Customer D']
-        warehouses = ['Warehouse North', 'Warehouse South', 'Warehouse East']
-        
-        row = {
-            'SO Date': so_date.strftime('%Y-%m-%d'),
-            'SO Total CBM': so_cbm,
-            'Sales Invoice Date': si_date.strftime('%Y-%m-%d'),
-            'SI Total CBM': si_cbm,
-            'Per Unit CBM': per_unit_cbm,
-            'Sales Order Qty': so_qty,
-            'Sales Invoice Qty': si_qty,
-            'Customer': random.choice(customers),
-            'Warehouse': random.choice(warehouses),
-            'Product Code': f'PROD-{i+1:03d}',
-            'Description': f'Sample Product {i+1}'
-        }
-        
-        data.append(row)
-    
-    return pd.DataFrame(data)
+# Column order shared by the generated workbooks
+COLUMNS = (
+    'SO Date', 'SO Total CBM', 'Sales Invoice Date', 'SI Total CBM', 'Per Unit CBM',
+    'Sales Order Qty', 'Sales Invoice Qty', 'Customer', 'Warehouse', 'Product Code', 'Description'
+)
+
+# Customer and warehouse values (optional grouping fields)
+CUSTOMERS = ('Customer A', 'Customer B', 'Customer C', 'Customer D')
+WAREHOUSES = ('Warehouse North', 'Warehouse South', 'Warehouse East')
+
+def create_sample_data(n_rows=100, seed=0):
+    """Create sample CBM data; a fixed seed keeps the committed workbook reproducible"""
+    
+    rng = np.random.default_rng(seed)
+    
+    # Format the calendar once (30 SO days plus up to 3 days of SI lag) and index into it
+    calendar = pd.date_range('2025-09-01', periods=30 + 3).strftime('%Y-%m-%d').to_numpy()
+    
+    # Sales Order data across September 2025
+    so_offsets = rng.integers(0, 30, n_rows)
+    so_cbm = rng.uniform(5.0, 50.0, n_rows).round(6)
+    
+    # Sales Invoice data (usually 1-3 days after SO)
+    si_offsets = so_offsets + rng.integers(1, 4, n_rows)
+    si_cbm = rng.uniform(3.0, 45.0, n_rows).round(6)
+    
+    # Additional fields
+    per_unit_cbm = rng.uniform(1.0, 5.0, n_rows).round(6)
+    so_qty = rng.integers(1, 21, n_rows)
+    si_qty = rng.integers(1, 16, n_rows)
+    
+    row_numbers = (np.arange(n_rows) + 1).astype(str)
+    
+    return pd.DataFrame({
+        'SO Date': calendar[so_offsets],
+        'SO Total CBM': so_cbm,
+        'Sales Invoice Date': calendar[si_offsets],
+        'SI Total CBM': si_cbm,
+        'Per Unit CBM': per_unit_cbm,
+        'Sales Order Qty': so_qty,
+        'Sales Invoice Qty': si_qty,
+        'Customer': rng.choice(CUSTOMERS, n_rows),
+        'Warehouse': rng.choice(WAREHOUSES, n_rows),
+        'Product Code': np.char.add('PROD-', np.char.zfill(row_numbers, 3)),
+        'Description': np.char.add('Sample Product ', row_numbers)
+    })
 
 def create_test_cases():
     """Create specific test cases for validation"""
     
     # Test case 1: Known totals for 2025-09-15
-    test_data = [
-        {
-            'SO Date': '2025-09-15',
-            'SO Total CBM': 22.123456,
-            'Sales Invoice Date': '2025-09-16',
-            'SI Total CBM': 25.123456,
-            'Per Unit CBM': 2.5,
-            'Sales Order Qty': 8,
-            'Sales Invoice Qty': 10,
-            'Customer': 'Test Customer A',
-            'Warehouse': 'Test Warehouse',
-            'Product Code': 'TEST-001',
-            'Description': 'Test Product 1'
-        },
-        {
-            'SO Date': '2025-09-15',
-            'SO Total CBM': 33.456789,
-            'Sales Invoice Date': '2025-09-17',
-            'SI Total CBM': 30.456789,
-            'Per Unit CBM': 3.0,
-            'Sales Order Qty': 11,
-            'Sales Invoice Qty': 10,
-            'Customer': 'Test Customer B',
-            'Warehouse': 'Test Warehouse',
-            'Product Code': 'TEST-002',
-            'Description': 'Test Product 2'
-        },
-        {
-            'SO Date': '2025-09-15',
-            'SO Total CBM': 10.437627,
-            'Sales Invoice Date': '2025-09-18',
-            'SI Total CBM': 10.437627,
-            'Per Unit CBM': 2.1,
-            'Sales Order Qty': 5,
-            'Sales Invoice Qty': 5,
-            'Customer': 'Test Customer C',
-            'Warehouse': 'Test Warehouse',
-            'Product Code': 'TEST-003',
-            'Description': 'Test Product 3'
-        }
+    rows = [
+        ('2025-09-15', 22.123456, '2025-09-16', 25.123456, 2.5, 8, 10,
+         'Test Customer A', 'Test Warehouse', 'TEST-001', 'Test Product 1'),
+        ('2025-09-15', 33.456789, '2025-09-17', 30.456789, 3.0, 11, 10,
+         'Test Customer B', 'Test Warehouse', 'TEST-002', 'Test Product 2'),
+        ('2025-09-15', 10.437627, '2025-09-18', 10.437627, 2.1, 5, 5,
+         'Test Customer C', 'Test Warehouse', 'TEST-003', 'Test Product 3')
     ]
     
     # Expected totals for 2025-09-15:
@@ -107,21 +80,42 @@ def create_test_cases():
     # Outbound CBM (SI): 0 (no SI on 2025-09-15)
     # Outbound Quantity (SI): 0 (no SI on 2025-09-15)
     
-    return pd.DataFrame(test_data)
+    return pd.DataFrame.from_records(rows, columns=COLUMNS)
+
+def write_workbook(df, path):
+    """Stream a DataFrame to xlsx row by row so memory stays flat as n_rows grows"""
+    
+    # constant_memory flushes each row once the next one starts, so rows must be
+    # written in order; pandas' to_excel writes column by column and would drop cells
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, df.columns)
+    for row_number, row in enumerate(df.itertuples(index=False), start=1):
+        worksheet.write_row(row_number, 0, row)
+    workbook.close()
 
 def main():
-    """Generate sample Excel files"""
+    """Regenerate the committed sample Excel files when run with --regen"""
+    
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--regen', action='store_true',
+                            help=f"rewrite the sample workbooks in {OUTPUT_DIR}")
+    args = arg_parser.parse_args()
+    
+    if not args.regen:
+        print(f"Sample Excel files are prebuilt in {OUTPUT_DIR}; pass --regen to rewrite them.")
+        return
     
     print("Creating sample Excel files...")
     
     # Create main sample file
     sample_data = create_sample_data()
-    sample_data.to_excel('sample_cbm_data.xlsx', index=False)
+    write_workbook(sample_data, OUTPUT_DIR / 'sample_cbm_data.xlsx')
     print(f"Created sample_cbm_data.xlsx with {len(sample_data)} rows")
     
     # Create test case file
     test_data = create_test_cases()
-    test_data.to_excel('test_cbm_data.xlsx', index=False)
+    write_workbook(test_data, OUTPUT_DIR / 'test_cbm_data.xlsx')
     print(f"Created test_cbm_data.xlsx with {len(test_data)} rows")
     
     # Print expected test results